@@ -51,6 +51,8 @@ class Config(object):
                             help='output more information while the script runs')
         parser.add_argument('--prefix', default="",
                             help='prefix for generated css class names')
+        parser.add_argument('--js-chunk-threshold', default=1048576, type=int,
+                            help='size in bytes above which a js file is split and rewritten in parallel (0 disables)')
 
         args = parser.parse_args()
 
@@ -61,3 +63,4 @@ class Config(object):
         self.view_extension = "html"
         self.verbose = args.verbose
         self.prefix = args.prefix
+        self.js_chunk_threshold = args.js_chunk_threshold
@@ -32,17 +32,27 @@
 
 import sys, re, glob, os
 import logging
+import itertools
+import concurrent.futures
 from operator import itemgetter
 from .util import Util, generate_gzip_friendly_tokens, find_all_files
+from .util import find_statement_boundaries, find_wrapper_function_body
+from .util import available_cpu_count
 
 import tinycss2
 import slimit
 import bs4
 from slimit.parser import Parser
 from slimit.visitors import nodevisitor
+from slimit.visitors.ecmavisitor import ECMAVisitor
 from slimit import ast
 
 
+# Statement standing in for the body of a wrapping function while the body is
+# rewritten in chunks
+JS_CHUNK_PLACEHOLDER = "__ruminatecss_chunk_placeholder__"
+
+
 class Obsfucator(object):
     def __init__(self, config):
         self.ids_found = set()
@@ -327,35 +337,228 @@ loops through classes and ids to process to determine shorter names to use for t
         if not js_content:
             return js_content
 
+        if 0 < self.config.js_chunk_threshold <= len(js_content):
+            replaced_js = self.optimizeJavascriptInChunks(js_content)
+            if replaced_js is not None:
+                return replaced_js
+
         parser = Parser()
         tree = parser.parse(js_content)
 
-        for node in nodevisitor.visit(tree):
-            if isinstance(node, ast.String):
-                # apparently the value includes the string literal characters so we
-                # need to remove those to get the contents of the string
-                string_contents = node.value.rstrip("'").lstrip("'")
-                # TODO: look for class names within the string instead. Right
-                # now the replace inside javascript only works for elm generated
-                # javascript using elm-css
-
-                # We get to conviently ignore the proper escaping of any characters
-                # inside the new value for the string because we are only replacing
-                # css selectors with different valid css selectors restricted to
-                # string.ascii_letters, so there should never be any special
-                # characters to replace. TODO: maybe put a regex here to make sure
-                # that the new value only contains [a-zA-Z]+ as we assume it does
-                if string_contents in self.class_map:
-                    new_value = "'{}'".format(self.class_map[string_contents])
-                    self.logger.info("replacing {} with {}".format(node.value, new_value))
-                    node.value = new_value
-                if string_contents in self.id_map:
-                    new_value = "'{}'".format(self.id_map[string_contents])
-                    self.logger.info("replacing {} with {}".format(node.value, new_value))
-                    node.value = new_value
+        for old_value, new_value in rewrite_javascript_strings(tree, self.class_map, self.id_map):
+            self.logger.info("replacing {} with {}".format(old_value, new_value))
 
         return tree.to_ecma()
 
+    def splitJavascript(self, js_content, workers):
+        """splits javascript into one chunk of statements per worker
+
+        The chunks are cut between statements so that concatenating their
+        rewritten output is identical to rewriting the whole file at once. If
+        one statement is a wrapping function (as elm generates) that holds
+        most of the file, the chunks are cut from the function body instead.
+
+        Arguments:
+        js_content -- string containing javascript to split
+        workers -- number of workers the chunks will be rewritten by
+
+        Returns:
+        (chunks, wrapper) tuple, where chunks is a list of (javascript, in_body)
+        tuples in file order and wrapper is the wrapping function with its body
+        replaced by a placeholder statement (or None if there is no wrapping
+        function), or None if the file can not be split evenly
+
+        """
+        chunk_size = len(js_content) // workers
+
+        def split_statements(begin, end):
+            statements = []
+            for boundary in find_statement_boundaries(js_content, begin, end):
+                statements.append((begin, boundary))
+                begin = boundary
+            if js_content[begin:end].strip():
+                statements.append((begin, end))
+            return statements
+
+        def group_statements(statements, in_body):
+            # group consecutive statements into chunks of roughly chunk_size
+            chunks = []
+            chunk_begin = None
+            for begin, end in statements:
+                if chunk_begin is None:
+                    chunk_begin = begin
+                if end - chunk_begin >= chunk_size:
+                    chunks.append((js_content[chunk_begin:end], in_body))
+                    chunk_begin = None
+            if chunk_begin is not None:
+                chunks.append((js_content[chunk_begin:statements[-1][1]], in_body))
+            return chunks
+
+        statements = split_statements(0, len(js_content))
+        if not statements:
+            return None
+
+        wrapper = None
+        largest = max(statements, key=lambda statement: statement[1] - statement[0])
+        body = None
+        if largest[1] - largest[0] > chunk_size:
+            body = find_wrapper_function_body(js_content, *largest)
+
+        if body is None:
+            chunks = group_statements(statements, False)
+        else:
+            begin, end = body
+            index = statements.index(largest)
+            # the body is replaced by a single placeholder statement that marks
+            # where the rewritten chunks are spliced back into the wrapper
+            wrapper = "{}\n{};\n{}".format( js_content[largest[0]:begin]
+                                          , JS_CHUNK_PLACEHOLDER
+                                          , js_content[end:largest[1]]
+                                          )
+            body_statements = split_statements(begin, end)
+            if not body_statements:
+                return None
+            chunks = ( group_statements(statements[:index], False)
+                     + group_statements(body_statements, True)
+                     + group_statements(statements[index + 1:], False)
+                     )
+
+        # a chunk much larger than its share leaves the other workers idle
+        if len(chunks) < 2 or max(len(chunk) for chunk, _ in chunks) > 2 * chunk_size:
+            return None
+        return chunks, wrapper
+
+    def optimizeJavascriptInChunks(self, js_content):
+        """optimizes a large javascript file by rewriting chunks of statements
+        in parallel
+
+        Uses:
+        Obsfucator.splitJavascript
+
+        Arguments:
+        js_content -- string containing javascript to optimize
+
+        Returns:
+        string -- contents to replace file with, or None if the file could not
+        be split and should be optimized serially
+
+        """
+        workers = available_cpu_count()
+        if workers < 2:
+            return None
+
+        split = self.splitJavascript(js_content, workers)
+        if split is None:
+            return None
+        chunks, wrapper = split
+
+        self.logger.info("rewriting javascript in {} chunks".format(len(chunks)))
+
+        indent_level = 0
+        wrapper_replacements = []
+        if wrapper is not None:
+            try:
+                tree = Parser().parse(wrapper)
+            except SyntaxError:
+                return None
+            wrapper_replacements = rewrite_javascript_strings(tree, self.class_map, self.id_map)
+            wrapper = tree.to_ecma()
+            placeholder_line = next(( line for line in wrapper.split("\n")
+                                      if line.strip() == JS_CHUNK_PLACEHOLDER + ";"
+                                    ), None)
+            if placeholder_line is None or wrapper.count(JS_CHUNK_PLACEHOLDER) != 1:
+                return None
+            indent_level = len(placeholder_line) - len(placeholder_line.lstrip(" "))
+
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map( optimize_javascript_chunk
+                                           , [chunk for chunk, _ in chunks]
+                                           , itertools.repeat(self.class_map)
+                                           , itertools.repeat(self.id_map)
+                                           , [indent_level if in_body else 0 for _, in_body in chunks]
+                                           ))
+        except SyntaxError:
+            self.logger.info("could not parse a javascript chunk, rewriting serially")
+            return None
+        except (concurrent.futures.BrokenExecutor, OSError) as e:
+            self.logger.error("could not rewrite javascript in parallel, rewriting serially: {}".format(e))
+            return None
+
+        # chunks holding nothing but comments produce no statements
+        statements = []
+        body = []
+        replacements = []
+        wrapper_placed = False
+        for (ecma, chunk_replacements), (_, in_body) in zip(results, chunks):
+            if in_body:
+                if not wrapper_placed:
+                    # the wrapper goes where its body starts
+                    statements.append(None)
+                    replacements.extend(wrapper_replacements)
+                    wrapper_placed = True
+                if ecma is not None:
+                    body.append(ecma)
+            elif ecma is not None:
+                statements.append(ecma)
+            replacements.extend(chunk_replacements)
+
+        for old_value, new_value in replacements:
+            self.logger.info("replacing {} with {}".format(old_value, new_value))
+
+        if wrapper is None:
+            return "\n".join(statements)
+        if not body:
+            return None
+        wrapper = wrapper.replace(placeholder_line, "\n".join(body))
+        return "\n".join(wrapper if ecma is None else ecma for ecma in statements)
+
+# Rewrite the string literals in a javascript syntax tree that exactly match a
+# class or id name and return the list of (old, new) values replaced
+def rewrite_javascript_strings(tree, class_map, id_map):
+    replacements = []
+    for node in nodevisitor.visit(tree):
+        if isinstance(node, ast.String):
+            # apparently the value includes the string literal characters so we
+            # need to remove those to get the contents of the string
+            string_contents = node.value.rstrip("'").lstrip("'")
+            # TODO: look for class names within the string instead. Right
+            # now the replace inside javascript only works for elm generated
+            # javascript using elm-css
+
+            # We get to conviently ignore the proper escaping of any characters
+            # inside the new value for the string because we are only replacing
+            # css selectors with different valid css selectors restricted to
+            # string.ascii_letters, so there should never be any special
+            # characters to replace. TODO: maybe put a regex here to make sure
+            # that the new value only contains [a-zA-Z]+ as we assume it does
+            if string_contents in class_map:
+                new_value = "'{}'".format(class_map[string_contents])
+                replacements.append((node.value, new_value))
+                node.value = new_value
+            if string_contents in id_map:
+                new_value = "'{}'".format(id_map[string_contents])
+                replacements.append((node.value, new_value))
+                node.value = new_value
+    return replacements
+
+# Parse and rewrite one chunk of javascript statements in a worker process.
+# The statements are printed at the indentation they would have had inside the
+# whole file so the chunks can be joined back together with newlines. Returns
+# the printed statements (None if the chunk holds no statements) and the list
+# of replacements made.
+def optimize_javascript_chunk(js_content, class_map, id_map, indent_level):
+    tree = Parser().parse(js_content)
+    replacements = rewrite_javascript_strings(tree, class_map, id_map)
+    if not tree.children():
+        return None, replacements
+
+    visitor = ECMAVisitor()
+    visitor.indent_level = indent_level
+    indent = " " * indent_level
+    ecma = "\n".join(indent + visitor.visit(child) for child in tree)
+    return ecma, replacements
+
 # Take the raw list of tokens produced by tinycss2 and find all the classnames
 # and return them as a list
 def get_classes_from_token_list(token_list):
@@ -86,6 +86,50 @@ def find_all_files(filepath_list):
                     files.append(os.path.join(dirname, filename))
     return files
 
+def available_cpu_count():
+    """counts the cpus this process may run on, respecting the affinity mask
+    and any cgroup cpu quota (such as docker --cpus) of the container we build
+    in"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, quota)
+    return max(cpus, 1)
+
+def cgroup_cpu_quota():
+    """reads the cgroup cpu quota, rounded up to whole cpus
+
+    Returns:
+    int, or None if there is no quota
+
+    """
+    def read(path):
+        with open(path) as f:
+            return f.read().strip()
+
+    try:
+        # cgroup v2 stores "<quota> <period>" with a quota of "max" for none
+        quota, period = read("/sys/fs/cgroup/cpu.max").split()
+    except (OSError, ValueError):
+        try:
+            # cgroup v1 stores the quota and period separately with -1 for none
+            quota = read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+            period = read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        except OSError:
+            return None
+
+    try:
+        quota, period = int(quota), int(period)
+    except ValueError:
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return -(-quota // period)
+
 class Util:
     """collection of various utility functions"""
 
@@ -209,3 +253,203 @@ class Util:
             if tuple[0] == key:
                 return True
         return False
+
+
+# Keywords after which a "/" starts a regular expression literal rather than a
+# division operator
+REGEX_PRECEDING_KEYWORDS = { "return", "typeof", "instanceof", "in", "of"
+                           , "new", "delete", "void", "throw", "case", "do"
+                           , "else", "yield"
+                           }
+
+# Prefix operators that may appear in front of an immediately invoked function
+IIFE_PREFIX_TOKENS = { "(", "!", "+", "-", "~", ";", "void" }
+
+def skip_quoted_javascript(js, i, end):
+    """returns the index just past the string literal starting at js[i]"""
+    quote = js[i]
+    i += 1
+    while i < end:
+        c = js[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == quote or (c == "\n" and quote != "`"):
+            return i + 1
+        i += 1
+    return end
+
+def skip_regex_javascript(js, i, end):
+    """returns the index just past the regex literal starting at js[i]"""
+    in_class = False
+    i += 1
+    while i < end:
+        c = js[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "\n":
+            return i
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            i += 1
+            # skip the flags
+            while i < end and (js[i].isalnum() or js[i] in "_$"):
+                i += 1
+            return i
+        i += 1
+    return end
+
+def javascript_tokens(js, begin=0, end=None):
+    """lexes just enough javascript to find statement boundaries
+
+    Comments, string literals, and regex literals are skipped. Everything else
+    is yielded as either a word (identifier, keyword, or number), an increment
+    or decrement operator, or a single punctuation character.
+
+    Arguments:
+    js -- string containing javascript
+    begin -- index to start lexing from
+    end -- index to stop lexing at
+
+    Returns:
+    generator of (offset, token) tuples
+
+    """
+    if end is None:
+        end = len(js)
+    previous = ""
+    i = begin
+    while i < end:
+        c = js[i]
+        if c.isspace():
+            i += 1
+        elif js.startswith("//", i):
+            i = js.find("\n", i, end)
+            if i == -1:
+                i = end
+        elif js.startswith("/*", i):
+            i = js.find("*/", i + 2, end)
+            i = end if i == -1 else i + 2
+        elif c in "'\"`":
+            i = skip_quoted_javascript(js, i, end)
+            previous = "literal"
+        elif c == "/" and ( previous == ""
+                          or previous in REGEX_PRECEDING_KEYWORDS
+                          or ( len(previous) == 1
+                             and not previous.isalnum()
+                             and previous not in ")]}"
+                             )
+                          ):
+            i = skip_regex_javascript(js, i, end)
+            previous = "literal"
+        elif c.isalnum() or c in "_$":
+            j = i + 1
+            while j < end and (js[j].isalnum() or js[j] in "_$"):
+                j += 1
+            previous = js[i:j]
+            yield i, previous
+            i = j
+        elif js.startswith("++", i) or js.startswith("--", i):
+            # "a++ / 2" is a division, so remember the whole operator
+            previous = js[i:i + 2]
+            yield i, previous
+            i += 2
+        else:
+            previous = c
+            yield i, c
+            i += 1
+
+def find_statement_boundaries(js, begin=0, end=None):
+    """finds offsets between which javascript statements can be safely cut
+
+    Only statements terminated by an explicit semicolon and function
+    declarations are split off, so automatic semicolon insertion can never
+    join two chunks differently than it would have joined the whole file.
+
+    Arguments:
+    js -- string containing javascript
+    begin -- index of the first statement
+    end -- index just past the last statement
+
+    Returns:
+    list of offsets, each one just past the end of a statement
+
+    """
+    boundaries = []
+    depth = 0
+    statement_start = None
+    # "do a(); while (b);" ends at the semicolon after the while condition
+    awaiting_while = False
+    pending = None
+    for offset, token in javascript_tokens(js, begin, end):
+        if pending is not None:
+            # "if (a) b; else c;" can not be split after "b;"
+            if token != "else":
+                boundaries.append(pending)
+            pending = None
+        if depth == 0 and statement_start is None:
+            statement_start = token
+            awaiting_while = token == "do"
+        elif depth == 0 and token == "while":
+            awaiting_while = False
+        if token in "([{":
+            depth += 1
+        elif token in ")]}":
+            depth -= 1
+            if depth < 0:
+                # unbalanced input, let the parser report it
+                return []
+            if depth == 0 and token == "}" and statement_start == "function":
+                pending = offset + 1
+                statement_start = None
+        elif token == ";" and depth == 0 and not awaiting_while:
+            pending = offset + 1
+            statement_start = None
+    return boundaries
+
+def find_wrapper_function_body(js, begin=0, end=None):
+    """finds the body of a function wrapping an entire statement
+
+    Compilers such as elm wrap all of their output inside a single immediately
+    invoked function, which leaves no top level statements to split between.
+
+    Arguments:
+    js -- string containing javascript
+    begin -- index of the statement
+    end -- index just past the statement
+
+    Returns:
+    (begin, end) tuple of offsets surrounding the function body, or None if the
+    statement does not start with a wrapping function
+
+    """
+    head = []
+    depth = 0
+    body_begin = None
+    for offset, token in javascript_tokens(js, begin, end):
+        if body_begin is None:
+            if token == "{":
+                body_begin = offset + 1
+                depth = 1
+            else:
+                head.append(token)
+        elif token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        return None
+
+    while head and head[0] in IIFE_PREFIX_TOKENS:
+        head.pop(0)
+    if len(head) < 3 or head[0] != "function" or head[-1] != ")":
+        return None
+    if head[1] != "(" and head[2] != "(":
+        return None
+    return body_begin, offset
@@ -0,0 +1,128 @@
+import logging
+import unittest
+from unittest import mock
+
+from ruminatecss.obsfucator import Obsfucator
+
+
+class FakeConfig(object):
+    def __init__(self, js_chunk_threshold):
+        self.css = []
+        self.views = []
+        self.js = []
+        self.ignore = []
+        self.view_extension = "html"
+        self.verbose = False
+        self.prefix = ""
+        self.js_chunk_threshold = js_chunk_threshold
+
+
+STATEMENTS = """var f{0} = F2(function(a, b) {{ if (a) {{ return 'box'; }} else {{ return {{x: 'special', y: [1, 2, 'a;b']}}; }} }});
+function g{0}(x) {{ var re = /[;{{(]'/g; for (var k = 0; k < 3; k++) {{ x = x / 2; }} return x ? 'file2' : "other"; }}
+// comment ; with {{ junk
+if (f{0}) g{0}(1);
+else g{0}(2);
+do g{0}(3); while (false);
+/* block ; }} */ var h{0} = {{a: 1,
+ b: 'box'}}
+var z{0} = 3;"""
+
+ELM_0_18_WRAPPER = "\n(function() {{\n'use strict';\n{}\n}}).call(this);\n"
+ELM_0_19_WRAPPER = "(function(scope){{\n'use strict';\n{}\n_Platform_export({{'Main': 'box'}});\n}}(this));\n"
+
+def make_javascript(wrapper):
+    body = "\n".join(STATEMENTS.format(i) for i in range(20))
+    return wrapper.format(body)
+
+
+class OptimizeJavascriptTest(unittest.TestCase):
+    def make_obsfucator(self, js_chunk_threshold):
+        # keep the log handlers out of the working directory and from piling
+        # up on the shared logger
+        with mock.patch("logging.FileHandler", side_effect=lambda path: logging.NullHandler()):
+            obsfucator = Obsfucator(FakeConfig(js_chunk_threshold))
+        for handler in obsfucator.logger.handlers:
+            self.addCleanup(obsfucator.logger.removeHandler, handler)
+        obsfucator.class_map = {"box": "a", "file2": "b"}
+        obsfucator.id_map = {"special": "c"}
+        return obsfucator
+
+    def assertChunked(self, js):
+        """checks the chunked path is taken and matches the serial path"""
+        serial = self.make_obsfucator(0).optimizeJavascript(js)
+        self.assertIn("'a'", serial)
+        self.assertIn("'c'", serial)
+        # force the chunked path even on single cpu machines
+        with mock.patch("ruminatecss.obsfucator.available_cpu_count", return_value=4):
+            chunked = self.make_obsfucator(1).optimizeJavascriptInChunks(js)
+        self.assertEqual(chunked, serial)
+
+    def test_top_level_statements(self):
+        self.assertChunked(make_javascript("{}\n"))
+
+    def test_elm_0_18_wrapper(self):
+        self.assertChunked(make_javascript(ELM_0_18_WRAPPER))
+        self.assertChunked(make_javascript(ELM_0_18_WRAPPER + "Elm.Main.fullscreen();\n"))
+
+    def test_elm_0_19_wrapper(self):
+        self.assertChunked(make_javascript(ELM_0_19_WRAPPER))
+        self.assertChunked(make_javascript(ELM_0_19_WRAPPER + "var app = Elm.Main.init({{'flags': 'box'}});\n"))
+
+    def test_wrapper_body_is_split(self):
+        js = make_javascript("var before = 1;\n" + ELM_0_19_WRAPPER + "var app = Elm.Main.init({{}});\n")
+        chunks, wrapper = self.make_obsfucator(1).splitJavascript(js, 4)
+        self.assertEqual(wrapper.split(), ["(function(scope){", "__ruminatecss_chunk_placeholder__;", "}(this));"])
+        self.assertIn("_Platform_export", chunks[-2][0])
+        self.assertEqual( [in_body for _, in_body in chunks]
+                        , [False] + [True] * (len(chunks) - 2) + [False]
+                        )
+        self.assertGreaterEqual(len(chunks), 5)
+        self.assertLessEqual(max(len(chunk) for chunk, _ in chunks), len(js) // 2)
+
+    def test_uneven_split_is_serial(self):
+        js = "var small = 1;\n" + make_javascript("var f = function() {{\n{}\n}};\n")
+        self.assertIsNone(self.make_obsfucator(1).splitJavascript(js, 4))
+
+    def assertThresholdUsesChunks(self, js, js_chunk_threshold, used):
+        obsfucator = self.make_obsfucator(js_chunk_threshold)
+        chunked = []
+        def spy(js_content):
+            chunked.append(Obsfucator.optimizeJavascriptInChunks(obsfucator, js_content))
+            return chunked[-1]
+        with mock.patch("ruminatecss.obsfucator.available_cpu_count", return_value=4), \
+             mock.patch.object(obsfucator, "optimizeJavascriptInChunks", side_effect=spy):
+            replaced_js = obsfucator.optimizeJavascript(js)
+        self.assertEqual(replaced_js, self.make_obsfucator(0).optimizeJavascript(js))
+        if used:
+            self.assertEqual(len(chunked), 1)
+            self.assertIsNotNone(chunked[0])
+        else:
+            self.assertEqual(chunked, [])
+
+    def test_threshold_disabled(self):
+        self.assertThresholdUsesChunks(make_javascript("{}\n"), 0, False)
+
+    def test_below_threshold(self):
+        js = make_javascript("{}\n")
+        self.assertThresholdUsesChunks(js, len(js) + 1, False)
+
+    def test_at_and_above_threshold(self):
+        js = make_javascript("{}\n")
+        self.assertThresholdUsesChunks(js, len(js), True)
+        self.assertThresholdUsesChunks(js, len(js) - 1, True)
+
+    def test_single_cpu_is_serial(self):
+        js = make_javascript("{}\n")
+        obsfucator = self.make_obsfucator(1)
+        with mock.patch("ruminatecss.obsfucator.available_cpu_count", return_value=1):
+            self.assertIsNone(obsfucator.optimizeJavascriptInChunks(js))
+
+    def test_unparsable_chunk_falls_back(self):
+        js = "var a = 1;\nvar b = 2;\nvar c = (;\n"
+        obsfucator = self.make_obsfucator(1)
+        with mock.patch("ruminatecss.obsfucator.available_cpu_count", return_value=4):
+            self.assertIsNone(obsfucator.optimizeJavascriptInChunks(js))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+from unittest import mock
+
+from ruminatecss.util import find_statement_boundaries, find_wrapper_function_body
+from ruminatecss.util import available_cpu_count, cgroup_cpu_quota
+
+
+class FindStatementBoundariesTest(unittest.TestCase):
+    def cut(self, js):
+        """splits js at every boundary found"""
+        pieces = []
+        begin = 0
+        for boundary in find_statement_boundaries(js):
+            pieces.append(js[begin:boundary].strip())
+            begin = boundary
+        pieces.append(js[begin:].strip())
+        return pieces
+
+    def test_semicolon_terminated_statements(self):
+        self.assertEqual( self.cut("var a = 1;\nvar b = 2;\nc();\n")
+                        , ["var a = 1;", "var b = 2;", "c();"]
+                        )
+
+    def test_no_cut_without_semicolon(self):
+        self.assertEqual(find_statement_boundaries("var a = 1\nvar b = 2\n"), [])
+
+    def test_function_declaration(self):
+        self.assertEqual( self.cut("function f(a) { return a; }\nvar b = {a: 1};\nc();")
+                        , ["function f(a) { return a; }", "var b = {a: 1};", "c();"]
+                        )
+
+    def test_no_cut_after_function_expression(self):
+        self.assertEqual( self.cut("var f = function() {}\n(g);\nc();")
+                        , ["var f = function() {}\n(g);", "c();"]
+                        )
+
+    def test_no_cut_inside_for_header(self):
+        self.assertEqual( self.cut("for (var i = 0; i < 3; i++) a(i);\nb();")
+                        , ["for (var i = 0; i < 3; i++) a(i);", "b();"]
+                        )
+
+    def test_if_else_without_braces(self):
+        self.assertEqual( self.cut("if (a) b();\nelse c();\nd();")
+                        , ["if (a) b();\nelse c();", "d();"]
+                        )
+
+    def test_do_while(self):
+        self.assertEqual( self.cut("do a(); while (b);\nc();")
+                        , ["do a(); while (b);", "c();"]
+                        )
+        self.assertEqual( self.cut("do { a(); } while (b);\nc();")
+                        , ["do { a(); } while (b);", "c();"]
+                        )
+
+    def test_regex_with_semicolon_and_quotes(self):
+        self.assertEqual( self.cut("var r = /;'\"/g;\nc();")
+                        , ["var r = /;'\"/g;", "c();"]
+                        )
+
+    def test_regex_with_character_class(self):
+        self.assertEqual( self.cut("var r = /[/;{(']/;\nc();")
+                        , ["var r = /[/;{(']/;", "c();"]
+                        )
+
+    def test_regex_after_keyword(self):
+        self.assertEqual( self.cut("function f() { return /;}/; }\nc();")
+                        , ["function f() { return /;}/; }", "c();"]
+                        )
+
+    def test_division_after_increment(self):
+        self.assertEqual( self.cut("var a = 1, x = a++ / 2, s = 'x/;y';\nc();")
+                        , ["var a = 1, x = a++ / 2, s = 'x/;y';", "c();"]
+                        )
+        self.assertEqual( self.cut("var x = a-- / 2, s = 'x/;y';\nc();")
+                        , ["var x = a-- / 2, s = 'x/;y';", "c();"]
+                        )
+
+    def test_string_with_escapes(self):
+        self.assertEqual( self.cut("var s = 'a\\';b', t = \"c\\\";d\";\nc();")
+                        , ["var s = 'a\\';b', t = \"c\\\";d\";", "c();"]
+                        )
+
+    def test_string_with_line_continuation(self):
+        self.assertEqual( self.cut("var s = 'a\\\n;b';\nc();")
+                        , ["var s = 'a\\\n;b';", "c();"]
+                        )
+
+    def test_comments(self):
+        self.assertEqual( self.cut("a(); // b; {\n/* c; } */ d();")
+                        , ["a();", "// b; {\n/* c; } */ d();"]
+                        )
+
+    def test_unbalanced(self):
+        self.assertEqual(find_statement_boundaries("a(); }); b();"), [])
+
+    def test_begin_and_end(self):
+        js = "{ a(); b(); }"
+        self.assertEqual(find_statement_boundaries(js, 1, len(js) - 1), [6])
+
+
+class FindWrapperFunctionBodyTest(unittest.TestCase):
+    def body(self, js):
+        begin, end = find_wrapper_function_body(js)
+        return js[begin:end]
+
+    def test_elm_0_18_wrapper(self):
+        js = "\n(function() {\n'use strict';\na();\n}).call(this);\n"
+        self.assertEqual(self.body(js), "\n'use strict';\na();\n")
+        js = "(function() {\na();\n})();\n"
+        self.assertEqual(self.body(js), "\na();\n")
+
+    def test_elm_0_19_wrapper(self):
+        js = "(function(scope){\n'use strict';\nfunction F(a) { return {}; }\n}(this));\n"
+        self.assertEqual(self.body(js), "\n'use strict';\nfunction F(a) { return {}; }\n")
+
+    def test_prefix_operator(self):
+        self.assertEqual(self.body("!function f(a){b();}();"), "b();")
+
+    def test_not_a_function(self):
+        self.assertIsNone(find_wrapper_function_body("var x = {a: 1};"))
+        self.assertIsNone(find_wrapper_function_body("if (a) { b(); }"))
+
+    def test_unclosed(self):
+        self.assertIsNone(find_wrapper_function_body("(function() { a();"))
+
+    def test_begin_and_end(self):
+        js = "var a = 1;\n(function() {\nb();\n})();\nElm.Main.fullscreen();"
+        begin = js.index("(")
+        end = js.index("Elm")
+        body_begin, body_end = find_wrapper_function_body(js, begin, end)
+        self.assertEqual(js[body_begin:body_end], "\nb();\n")
+        self.assertIsNone(find_wrapper_function_body(js))
+
+
+class AvailableCpuCountTest(unittest.TestCase):
+    def test_cgroup_quota(self):
+        with mock.patch("ruminatecss.util.cgroup_cpu_quota", return_value=1):
+            self.assertEqual(available_cpu_count(), 1)
+
+    def test_no_cgroup_quota(self):
+        with mock.patch("ruminatecss.util.cgroup_cpu_quota", return_value=None):
+            self.assertGreaterEqual(available_cpu_count(), 1)
+
+    def test_cgroup_v2_quota(self):
+        with mock.patch("builtins.open", mock.mock_open(read_data="150000 100000\n")):
+            self.assertEqual(cgroup_cpu_quota(), 2)
+        with mock.patch("builtins.open", mock.mock_open(read_data="max 100000\n")):
+            self.assertIsNone(cgroup_cpu_quota())
+
+
+if __name__ == "__main__":
+    unittest.main()